@@ -3,6 +3,7 @@
 import logging
 import aiohttp
 import asyncio
+import orjson
 
 from powietrze import base
 
@@ -15,34 +16,64 @@ class APIError(Exception):
 
 
 class API(base.BaseAPI):
-    def __init__(self, timeout=5, session=None):
-        super().__init__(timeout)
-        if session is None:
-            async def _create_session():
-                return aiohttp.ClientSession()
-            loop = asyncio.get_event_loop()
-            self._session = loop.run_until_complete(_create_session())
-        else:
-            self._session = session
+    def __init__(self, timeout=5, session=None, cache_path=None):
+        super().__init__(timeout, cache_path)
+        self._session = session
+        self._own_session = False
+
+    async def __aenter__(self):
+        await self._ensure_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        if self._own_session:
+            await self._session.close()
+            self._session = None
+            self._own_session = False
+
+    async def _ensure_session(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit_per_host=16, keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._own_session = True
 
     async def fetch_stations_data(self):
-        self._stations_data = await self._fetch_json(self._api_all_stations_url, self._timeout)
+        stations_data = self._read_stations_cache(max_age=base.STATIONS_CACHE_TTL)
+        if stations_data is None:
+            cached_data, cached_etag = self._read_stations_cache_for_revalidation()
+            stations_data, etag = await self._fetch_json_if_modified(
+                self._api_all_stations_url, self._timeout, cached_etag)
+            stations_data = self._update_stations_cache(stations_data, etag, cached_data)
+        self._set_stations_data(stations_data)
 
     def _create_station_object(self, station, distance=None):
         return super()._create_station_object(StationAsync, station, distance)
 
     async def _fetch_json(self, url, timeout):
+        data, _ = await self._fetch_json_if_modified(url, timeout)
+        return data
+
+    async def _fetch_json_if_modified(self, url, timeout, etag=None):
         client_timeout = aiohttp.ClientTimeout(total=timeout)
+        headers = {} if etag is None else {'If-None-Match': etag}
+        await self._ensure_session()
         try:
-            async with self._session.get(url, timeout=client_timeout) as resp:
+            async with self._session.get(url, timeout=client_timeout, headers=headers) as resp:
+                if resp.status == 304 and etag is not None:
+                    return None, etag
                 if resp.status != 200:
                     raise APIError('{} returned {}'.format(url, resp.status))
-                return await resp.json()
+                if resp.content_type != 'application/json':
+                    raise APIError("{} didn't return JSON: {}".format(url, resp.content_type))
+                return orjson.loads(await resp.read()), resp.headers.get('ETag')
         except asyncio.TimeoutError:
             raise APIError('{} timeouted'.format(url))
         except aiohttp.client_exceptions.ClientConnectorError as err:
             raise APIError('{} connection error: {}'.format(url, err))
-        except aiohttp.client_exceptions.ContentTypeError as err:
+        except orjson.JSONDecodeError as err:
             raise APIError("{} didn't return valid JSON: {}".format(url, err))
 
 
@@ -51,14 +82,19 @@ class StationAsync(base.BaseStation):
         super().__init__(api, station_id, name, city, lon, lat, timeout, distance)
 
     async def async_fetch_sensors_data(self):
-        url = self._api_station_url.format(stationId=self._station_id)
-        self._sensors_data = await self._api._fetch_json(url, self._timeout)
+        self._sensors_data = await self._api._fetch_json(self._api_station_url, self._timeout)
 
     async def async_fetch_measurements(self):
+        urls = self._get_sensors_urls()
+        results = await asyncio.gather(
+            *(self._api._fetch_json(url, self._timeout) for url in urls),
+            return_exceptions=True)
+
         measurements = {}
-        for sensor_id in self._get_sensors_ids():
-            url = self._api_sensor_url.format(sensorId=sensor_id)
-            data = await self._api._fetch_json(url, self._timeout)
+        for url, data in zip(urls, results):
+            if isinstance(data, BaseException):
+                _LOGGER.warning('Skipping sensor %s: %s', url, data)
+                continue
             measurements[data['key']] = data['values']
 
         self._measurements = measurements
@@ -1,63 +1,171 @@
 # -*- coding: utf-8 -*-
 
-import math
+import collections
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+import orjson
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+    'powietrze', 'stations.json')
+STATIONS_CACHE_TTL = 24 * 60 * 60  # seconds
+
+
+def _replace_file(path, content):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                    prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
 
 
 class BaseAPI:
-    def __init__(self, timeout=5):
+    def __init__(self, timeout=5, cache_path=None):
         self._api_all_stations_url = 'http://api.gios.gov.pl/pjp-api/rest/station/findAll'
-        self._stations_data = []
+        self._set_stations_data([])
 
         self._timeout = timeout
+        self._cache_path = os.path.abspath(cache_path) if cache_path is not None else None
+
+    def _read_stations_cache(self, max_age=None):
+        if self._cache_path is None:
+            return None
+        try:
+            if max_age is not None and \
+                    os.stat(self._cache_path).st_mtime < time.time() - max_age:
+                return None
+            with open(self._cache_path, 'rb') as f:
+                stations_data = orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return None
+        # anything but a list of station objects is treated like a missing cache
+        if not isinstance(stations_data, list) or \
+                not all(isinstance(station, dict) for station in stations_data):
+            return None
+        return stations_data
+
+    def _read_stations_cache_for_revalidation(self):
+        # an ETag is only usable together with a cached body that still parses
+        cached_data = self._read_stations_cache()
+        if cached_data is None:
+            self._remove_stations_cache_etag()
+            return None, None
+        try:
+            with open(self._cache_path + '.etag') as f:
+                return cached_data, f.read().strip() or None
+        except OSError:
+            return cached_data, None
+
+    def _remove_stations_cache_etag(self):
+        if self._cache_path is None:
+            return
+        try:
+            os.remove(self._cache_path + '.etag')
+        except FileNotFoundError:
+            pass
+        except OSError as err:
+            _LOGGER.warning('Unable to remove stations cache ETag %s: %s', self._cache_path, err)
+
+    def _update_stations_cache(self, stations_data, etag, cached_data):
+        # stations_data is None when the server answered 304 Not Modified to cached_data's ETag
+        if self._cache_path is None:
+            return stations_data
+        if stations_data is None:
+            try:
+                os.utime(self._cache_path)
+            except OSError as err:
+                _LOGGER.warning('Unable to touch stations cache %s: %s', self._cache_path, err)
+            return cached_data
+        try:
+            os.makedirs(os.path.dirname(self._cache_path), exist_ok=True)
+            self._remove_stations_cache_etag()
+            _replace_file(self._cache_path, orjson.dumps(stations_data))
+            if etag is not None:
+                _replace_file(self._cache_path + '.etag', etag.encode())
+        except OSError as err:
+            _LOGGER.warning('Unable to update stations cache %s: %s', self._cache_path, err)
+        return stations_data
+
+    def _set_stations_data(self, stations_data):
+        for station in stations_data:
+            station['_lat'] = float(station['gegrLat'])
+            station['_lon'] = float(station['gegrLon'])
+            station['_city'] = station['city']['name'] if station['city'] is not None else None
+        self._stations_data = stations_data
+        self._stations_lat = np.fromiter((s['_lat'] for s in stations_data),
+                                         dtype=np.float64, count=len(stations_data))
+        self._stations_lon = np.fromiter((s['_lon'] for s in stations_data),
+                                         dtype=np.float64, count=len(stations_data))
+        self._index_stations()
+
+    def _index_stations(self):
+        self._by_id = {}
+        self._by_name = collections.defaultdict(list)
+        self._by_city = collections.defaultdict(list)
+        for position, station in enumerate(self._stations_data):
+            self._by_id[station['id']] = position
+            self._by_name[station['stationName']].append(position)
+            if station['_city'] is not None:
+                self._by_city[station['_city']].append(position)
+
+    def _create_stations_at(self, positions):
+        return [self._create_station_object(self._stations_data[position])
+                for position in sorted(positions)]
 
     def create_stations_by_ids(self, station_ids):
-        rv = []
-        for station in self._stations_data:
-            if station['id'] in station_ids:
-                rv.append(self._create_station_object(station))
-        return rv
+        return self._create_stations_at(
+            self._by_id[station_id] for station_id in set(station_ids)
+            if station_id in self._by_id)
 
     def create_stations_by_names(self, names):
-        rv = []
-        for station in self._stations_data:
-            if station['stationName'] in names:
-                rv.append(self._create_station_object(station))
-        return rv
+        return self._create_stations_at(
+            position for name in set(names) for position in self._by_name.get(name, ()))
 
     def create_stations_by_city_name(self, city_name):
-        rv = []
-        for station in self._stations_data:
-            if station['city'] is not None and station['city']['name'] == city_name:
-                rv.append(self._create_station_object(station))
-        return rv
+        return self._create_stations_at(self._by_city.get(city_name, ()))
 
     def create_stations_by_location(self, latitude, longitude, max_stations=5, max_distance=30000):
-        data = [(self._approximate_distance(
-            (latitude, longitude),
-            (float(s['gegrLat']), float(s['gegrLon']))), s) for s in self._stations_data]
-        data.sort(key=lambda x: x[0])
-        return [self._create_station_object(station, dist)
-                for dist, station in (data[:max_stations]) if dist <= max_distance]
-
-    def _approximate_distance(self, point1, point2):
+        distances = self._approximate_distances(
+            (latitude, longitude), self._stations_lat, self._stations_lon)
+        count = min(max_stations, len(distances))
+        if count <= 0:
+            return []
+        nearest = np.argpartition(distances, count - 1)[:count]
+        nearest = nearest[np.argsort(distances[nearest], kind='stable')]
+        return [self._create_station_object(self._stations_data[i], float(distances[i]))
+                for i in nearest if distances[i] <= max_distance]
+
+    def _approximate_distances(self, point, lats, lons):
         R = 6372800  # Earth radius in meters
-        lat1, lon1 = point1
-        lat2, lon2 = point2
-        phi1, phi2 = math.radians(lat1), math.radians(lat2)
-        dphi = math.radians(lat2 - lat1)
-        dlambda = math.radians(lon2 - lon1)
-        a = math.sin(dphi/2)**2 + \
-            math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-        return 2*R*math.atan2(math.sqrt(a), math.sqrt(1 - a))
+        lat0, lon0 = point
+        phi0, phi = np.radians(lat0), np.radians(lats)
+        dphi = phi - phi0
+        dlambda = np.radians(lons - lon0)
+        a = np.sin(dphi/2)**2 + \
+            np.cos(phi0)*np.cos(phi)*np.sin(dlambda/2)**2
+        return 2*R*np.arctan2(np.sqrt(a), np.sqrt(1 - a))
 
     def _create_station_object(self, class_name, station, distance=None):
         return class_name(
                 api=self,
                 station_id=station['id'],
                 name=station['stationName'],
-                city=station['city']['name'],
-                lon=station['gegrLon'],
-                lat=station['gegrLat'],
+                city=station['_city'],
+                lon=station['_lon'],
+                lat=station['_lat'],
                 timeout=self._timeout,
                 distance=distance)
 
@@ -67,8 +175,9 @@ class BaseStation:
         self._api = api
 
         self._station_id = station_id
-        self._api_station_url = 'http://api.gios.gov.pl/pjp-api/rest/station/sensors/{stationId}'
-        self._api_sensor_url = 'http://api.gios.gov.pl/pjp-api/rest/data/getData/{sensorId}'
+        self._api_station_url = \
+            'http://api.gios.gov.pl/pjp-api/rest/station/sensors/{}'.format(station_id)
+        self._api_sensor_base_url = 'http://api.gios.gov.pl/pjp-api/rest/data/getData/'
 
         self._sensors_data = []
         self._measurements = {}
@@ -94,17 +203,17 @@ class BaseStation:
     def name(self):
         return self._name
 
-    def _get_sensors_ids(self):
-        return [sensor['id'] for sensor in self._sensors_data]
+    def _get_sensors_urls(self):
+        return [self._api_sensor_base_url + str(sensor['id']) for sensor in self._sensors_data]
 
     def get_available_params(self):
         return [sensor['param']['paramCode'] for sensor in self._sensors_data]
 
     def get_newest_measurements(self):
+        # the API returns values newest first, so the first non-empty one is the newest
         rv = {}
         for key, value in self._measurements.items():
-            for measurement in value:
-                if measurement['value'] is not None:
-                    rv[key] = measurement
-                    break
+            measurement = next((m for m in value if m['value'] is not None), None)
+            if measurement is not None:
+                rv[key] = measurement
         return rv
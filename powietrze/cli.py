@@ -2,15 +2,31 @@
 
 """Console script for powietrze."""
 import sys
+import asyncio
 import click
 
-from powietrze import sync
+from powietrze import asynchronous, base
 
 
-def print_station(station) -> None:
-    station.fetch_sensors_data()
-    station.fetch_measurements()
+async def fetch_station(station) -> None:
+    await station.async_fetch_sensors_data()
+    await station.async_fetch_measurements()
+
+
+async def fetch_stations(cache_path, create_stations):
+    async with asynchronous.API(cache_path=cache_path) as api:
+        await api.fetch_stations_data()
+        stations = create_stations(api)
+        await asyncio.gather(*(fetch_station(station) for station in stations))
+    return stations
+
 
+def print_stations(cache_path, create_stations) -> None:
+    for station in asyncio.run(fetch_stations(cache_path, create_stations)):
+        print_station(station)
+
+
+def print_station(station) -> None:
     click.echo('{}:'.format(station))
     measurements = station.get_newest_measurements()
     for key, value in measurements.items():
@@ -18,50 +34,41 @@ def print_station(station) -> None:
 
 
 @click.group()
-def cli():
-    pass
+@click.option('--no-cache', is_flag=True,
+              help='Download the stations list instead of using the local cache.')
+@click.pass_context
+def cli(ctx, no_cache):
+    ctx.obj = {'cache_path': None if no_cache else base.DEFAULT_CACHE_PATH}
 
 
 @cli.command()
 @click.argument('station_ids', type=int, nargs=-1)
-def get_measurements_by_station_id(station_ids):
+@click.pass_obj
+def get_measurements_by_station_id(obj, station_ids):
     click.echo('Get newest measurements by station IDs ({})'.format(station_ids))
     click.echo()
 
-    api = sync.API()
-    api.fetch_stations_data()
-    stations = api.create_stations_by_ids(station_ids)
-
-    for station in stations:
-        print_station(station)
+    print_stations(obj['cache_path'], lambda api: api.create_stations_by_ids(station_ids))
 
 
 @cli.command()
 @click.argument('station_names', nargs=-1)
-def get_measurements_by_station_name(station_names):
+@click.pass_obj
+def get_measurements_by_station_name(obj, station_names):
     click.echo('Get newest measurements by station names ({})'.format(station_names))
     click.echo()
 
-    api = sync.API()
-    api.fetch_stations_data()
-    stations = api.create_stations_by_names(station_names)
-
-    for station in stations:
-        print_station(station)
+    print_stations(obj['cache_path'], lambda api: api.create_stations_by_names(station_names))
 
 
 @cli.command()
 @click.argument('city_name')
-def get_measurements_by_city_name(city_name):
+@click.pass_obj
+def get_measurements_by_city_name(obj, city_name):
     click.echo('Get newest measurements by city name ({})'.format(city_name))
     click.echo()
 
-    api = sync.API()
-    api.fetch_stations_data()
-    stations = api.create_stations_by_city_name(city_name)
-
-    for station in stations:
-        print_station(station)
+    print_stations(obj['cache_path'], lambda api: api.create_stations_by_city_name(city_name))
 
 
 @cli.command()
@@ -71,19 +78,15 @@ def get_measurements_by_city_name(city_name):
               help='Maximum number of stations to return.')
 @click.option('--max_distance', default=10, show_default=True, type=float,
               help='Maximum distance to station in kilometers.')
-def get_measurements_by_location(latitude, longitude, max_stations, max_distance):
+@click.pass_obj
+def get_measurements_by_location(obj, latitude, longitude, max_stations, max_distance):
     click.echo('Get newest measurements by location ({}, {})'.format(latitude, longitude))
     click.echo('max_stations = {}'.format(max_stations))
     click.echo('max_distance = {} km'.format(max_distance))
     click.echo()
 
-    api = sync.API()
-    api.fetch_stations_data()
-    stations = api.create_stations_by_location(latitude, longitude, max_stations=max_stations,
-                                               max_distance=max_distance*1000)
-
-    for station in stations:
-        print_station(station)
+    print_stations(obj['cache_path'], lambda api: api.create_stations_by_location(
+        latitude, longitude, max_stations=max_stations, max_distance=max_distance*1000))
 
 
 if __name__ == "__main__":
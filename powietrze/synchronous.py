@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 
 import requests
-import json
+import orjson
 from powietrze import base
 
+_SESSION = requests.Session()
+_SESSION.mount('http://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=16))
+
 
 class APIError(Exception):
     def __init__(self, message):
@@ -11,26 +14,40 @@ class APIError(Exception):
 
 
 def sync_fetch_json(url, timeout):
+    data, _ = sync_fetch_json_if_modified(url, timeout)
+    return data
+
+
+def sync_fetch_json_if_modified(url, timeout, etag=None):
+    headers = {} if etag is None else {'If-None-Match': etag}
     try:
-        r = requests.get(url, timeout=timeout)
+        r = _SESSION.get(url, timeout=timeout, headers=headers)
 
+        if r.status_code == 304 and etag is not None:
+            return None, etag
         if r.status_code != 200:
             raise APIError('{} returned {}'.format(url, r.status_code))
-        return r.json()
+        return orjson.loads(r.content), r.headers.get('ETag')
     except requests.exceptions.ConnectionError as err:
         raise APIError('{} connection error: {}'.format(url, err))
     except requests.exceptions.ReadTimeout as err:
         raise APIError('{} timeout error: {}'.format(url, err))
-    except json.decoder.JSONDecodeError as err:
+    except orjson.JSONDecodeError as err:
         raise APIError("{} returned invalid JSON: {}".format(url, err))
 
 
 class API(base.BaseAPI):
-    def __init__(self, timeout=5):
-        super().__init__(timeout)
+    def __init__(self, timeout=5, cache_path=None):
+        super().__init__(timeout, cache_path)
 
     def fetch_stations_data(self):
-        self._stations_data = sync_fetch_json(self._api_all_stations_url, self._timeout)
+        stations_data = self._read_stations_cache(max_age=base.STATIONS_CACHE_TTL)
+        if stations_data is None:
+            cached_data, cached_etag = self._read_stations_cache_for_revalidation()
+            stations_data, etag = sync_fetch_json_if_modified(
+                self._api_all_stations_url, self._timeout, cached_etag)
+            stations_data = self._update_stations_cache(stations_data, etag, cached_data)
+        self._set_stations_data(stations_data)
 
     def _create_station_object(self, station, distance=None):
         return super()._create_station_object(StationSync, station, distance)
@@ -41,13 +58,12 @@ class StationSync(base.BaseStation):
         super().__init__(api, station_id, name, city, lon, lat, timeout, distance)
 
     def fetch_sensors_data(self):
-        self._sensors_data = sync_fetch_json(
-            self._api_station_url.format(stationId=self._station_id), self._timeout)
+        self._sensors_data = sync_fetch_json(self._api_station_url, self._timeout)
 
     def fetch_measurements(self):
         measurements = {}
-        for sensor_id in self._get_sensors_ids():
-            data = sync_fetch_json(self._api_sensor_url.format(sensorId=sensor_id), self._timeout)
+        for url in self._get_sensors_urls():
+            data = sync_fetch_json(url, self._timeout)
             measurements[data['key']] = data['values']
 
         self._measurements = measurements
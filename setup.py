@@ -11,7 +11,8 @@ with open('README.rst') as readme_file:
 with open('HISTORY.rst') as history_file:
     history = history_file.read()
 
-requirements = ['Click>=6.0', 'requests>=2.21.0', 'aiohttp>=3.5.4']
+requirements = ['Click>=6.0', 'requests>=2.21.0', 'aiohttp>=3.5.4', 'numpy>=1.16.0',
+                'orjson>=2.0.0']
 
 setup_requirements = ['pytest-runner', ]
 
@@ -25,12 +26,7 @@ setup(
         'Intended Audience :: Developers',
         'License :: OSI Approved :: MIT License',
         'Natural Language :: English',
-        "Programming Language :: Python :: 2",
-        'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
     ],
     description="Python library to talk to the http://powietrze.gios.gov.pl API.",
@@ -40,6 +36,7 @@ setup(
         ],
     },
     install_requires=requirements,
+    python_requires='>=3.7',
     license="MIT license",
     long_description=readme + '\n\n' + history,
     include_package_data=True,
@@ -5,12 +5,14 @@
 
 import aiohttp
 import asyncio
+import os
 import pytest
 import socket
+import time
 
 from collections import namedtuple
 
-from powietrze import asynchronous
+from powietrze import asynchronous, base
 
 
 class CaseControlledTestServer(aiohttp.test_utils.RawTestServer):
@@ -284,6 +286,122 @@ SAMPLE_RESULT_STATION_DATA_3575 = """
     ]
 }
 """
+
+SAMPLE_RESULT_STATION_DATA_3584 = """
+{
+    "key": "PM10",
+    "values": [
+        {
+            "date": "2019-06-25 23:00:00",
+            "value": null
+        },
+        {
+            "date": "2019-06-25 22:00:00",
+            "value": 21.3
+        },
+        {
+            "date": "2019-06-25 21:00:00",
+            "value": 24.8
+        }
+    ]
+}
+"""
+
+
+@pytest.mark.asyncio
+async def test_api_context_manager_owns_session(loop):
+    api = asynchronous.API()
+    async with api:
+        session = api._session
+        assert isinstance(session, aiohttp.ClientSession)
+    assert session.closed
+    assert api._session is None
+
+
+@pytest.mark.asyncio
+async def test_api_creates_session_lazily(loop):
+    api = asynchronous.API()
+    assert api._session is None
+    await api._ensure_session()
+    session = api._session
+    assert isinstance(session, aiohttp.ClientSession)
+    await api._ensure_session()
+    assert api._session is session
+    await api.close()
+    assert session.closed
+    assert api._session is None
+
+
+@pytest.mark.asyncio
+async def test_api_context_manager_keeps_external_session(aiohttp_redirector, loop):
+    async with asynchronous.API(session=aiohttp_redirector.session) as api:
+        assert api._session is aiohttp_redirector.session
+    assert not aiohttp_redirector.session.closed
+
+
+@pytest.mark.asyncio
+async def test_api_fetch_invalid_json(aiohttp_redirector, loop):
+    async with CaseControlledTestServer() as server:
+        aiohttp_redirector.add_server('api.gios.gov.pl', 80, server.port)
+        api = asynchronous.API(session=aiohttp_redirector.session)
+
+        task = loop.create_task(api.fetch_stations_data())
+        request = await server.receive_request()
+        server.send_response(request, text='[{"id": 114', content_type='application/json',)
+
+        with pytest.raises(asynchronous.APIError):
+            await task
+
+
+@pytest.mark.asyncio
+async def test_api_fetch_not_json(aiohttp_redirector, loop):
+    async with CaseControlledTestServer() as server:
+        aiohttp_redirector.add_server('api.gios.gov.pl', 80, server.port)
+        api = asynchronous.API(session=aiohttp_redirector.session)
+
+        task = loop.create_task(api.fetch_stations_data())
+        request = await server.receive_request()
+        server.send_response(request, text='<html></html>', content_type='text/html',)
+
+        with pytest.raises(asynchronous.APIError):
+            await task
+
+
+@pytest.mark.asyncio
+async def test_api_fetch_stations_data_cached(aiohttp_redirector, loop, tmpdir):
+    cache_path = str(tmpdir.join('stations.json'))
+    async with CaseControlledTestServer() as server:
+        aiohttp_redirector.add_server('api.gios.gov.pl', 80, server.port)
+        api = asynchronous.API(session=aiohttp_redirector.session, cache_path=cache_path)
+
+        task = loop.create_task(api.fetch_stations_data())
+        request = await server.receive_request()
+        assert 'If-None-Match' not in request.headers
+        server.send_response(request, text=SAMPLE_RESULT_FIND_ALL, content_type='application/json',
+                             headers={'ETag': '"v1"'})
+        await task
+
+        assert os.path.exists(cache_path)
+
+        # a fresh cache is used without asking the server
+        api = asynchronous.API(session=aiohttp_redirector.session, cache_path=cache_path)
+        await api.fetch_stations_data()
+        assert len(api.create_stations_by_city_name('Wrocław')) == 2
+
+        # a stale cache is revalidated with its ETag
+        stale = time.time() - 2 * base.STATIONS_CACHE_TTL
+        os.utime(cache_path, (stale, stale))
+        api = asynchronous.API(session=aiohttp_redirector.session, cache_path=cache_path)
+        task = loop.create_task(api.fetch_stations_data())
+        request = await server.receive_request()
+        assert request.headers['If-None-Match'] == '"v1"'
+        server.send_response(request, status=304)
+        await task
+
+        assert len(api.create_stations_by_city_name('Wrocław')) == 2
+        assert os.stat(cache_path).st_mtime > stale
+
+
 @pytest.mark.asyncio
 async def test_api_create_stations_by_names(aiohttp_redirector, loop):
     async with CaseControlledTestServer() as server:
@@ -322,6 +440,27 @@ async def test_api_create_stations_by_ids(aiohttp_redirector, loop):
         assert stations[0].name == 'Wrocław - Korzeniowskiego'
 
 
+@pytest.mark.asyncio
+async def test_api_create_stations_by_city_name(aiohttp_redirector, loop):
+    async with CaseControlledTestServer() as server:
+        aiohttp_redirector.add_server('api.gios.gov.pl', 80, server.port)
+        api = asynchronous.API(session=aiohttp_redirector.session)
+
+        task = loop.create_task(api.fetch_stations_data())
+        request = await server.receive_request()
+        assert request.path_qs == '/pjp-api/rest/station/findAll'
+
+        server.send_response(request, text=SAMPLE_RESULT_FIND_ALL, content_type='application/json',)
+        await task
+
+        stations = api.create_stations_by_city_name('Wrocław')
+
+        assert len(stations) == 2
+        assert stations[0].name == 'Wrocław - Bartnicza'
+        assert stations[1].name == 'Wrocław - Korzeniowskiego'
+        assert api.create_stations_by_city_name('Kraków') == []
+
+
 @pytest.mark.asyncio
 async def test_api_create_stations_by_location(aiohttp_redirector, loop):
     async with CaseControlledTestServer() as server:
@@ -342,6 +481,37 @@ async def test_api_create_stations_by_location(aiohttp_redirector, loop):
         assert stations[1].name == 'Wrocław - Bartnicza'
 
 
+@pytest.mark.asyncio
+async def test_api_create_stations_by_location_limits(aiohttp_redirector, loop):
+    async with CaseControlledTestServer() as server:
+        aiohttp_redirector.add_server('api.gios.gov.pl', 80, server.port)
+        api = asynchronous.API(session=aiohttp_redirector.session)
+
+        task = loop.create_task(api.fetch_stations_data())
+        request = await server.receive_request()
+        assert request.path_qs == '/pjp-api/rest/station/findAll'
+
+        server.send_response(request, text=SAMPLE_RESULT_FIND_ALL, content_type='application/json',)
+        await task
+
+        # fewer stations requested than available: the nearest ones, closest first
+        stations = api.create_stations_by_location(52.219298, 21.004724,
+                                                   max_stations=3, max_distance=1000000)
+        assert [s.name for s in stations] == ['Warszawa-Komunikacyjna',
+                                              'Bydgoszcz Warszawska',
+                                              'Wrocław - Bartnicza']
+        assert stations[1]._distance == pytest.approx(227000, rel=0.01)
+
+        stations = api.create_stations_by_location(51.129378, 17.029250, max_stations=1)
+        assert [s.name for s in stations] == ['Wrocław - Korzeniowskiego']
+
+        # Wrocław - Bartnicza is about 8 km away and falls outside the cutoff
+        stations = api.create_stations_by_location(51.129378, 17.029250, max_distance=5000)
+        assert [s.name for s in stations] == ['Wrocław - Korzeniowskiego']
+
+        assert api.create_stations_by_location(51.129378, 17.029250, max_stations=0) == []
+
+
 @pytest.mark.asyncio
 async def test_station_get_available_params(aiohttp_redirector, loop):
     async with CaseControlledTestServer() as server:
@@ -402,11 +572,21 @@ async def test_station_async_fetch_measurements(aiohttp_redirector, loop):
         assert set(available_params)==set(('C6H6', 'PM10', 'PM2.5'))
 
         task = loop.create_task(station.async_fetch_measurements())
-        for x in range(1):
+        requests = {}
+        for x in range(3):
             request = await server.receive_request()
-            
-            assert request.path_qs == '/pjp-api/rest/data/getData/3575'
-            server.send_response(request, text=SAMPLE_RESULT_STATION_DATA_3575, content_type='application/json',)
-            server.send_response(request, text=SAMPLE_RESULT_STATION_DATA_3575, content_type='application/json',)
-            server.send_response(request, text=SAMPLE_RESULT_STATION_DATA_3575, content_type='application/json',)
-            await task
+            requests[request.path_qs] = request
+
+        assert set(requests) == set('/pjp-api/rest/data/getData/{}'.format(sensor_id)
+                                    for sensor_id in (3575, 3584, 3585))
+        server.send_response(requests['/pjp-api/rest/data/getData/3575'],
+                             text=SAMPLE_RESULT_STATION_DATA_3575, content_type='application/json',)
+        server.send_response(requests['/pjp-api/rest/data/getData/3584'],
+                             text=SAMPLE_RESULT_STATION_DATA_3584, content_type='application/json',)
+        server.send_response(requests['/pjp-api/rest/data/getData/3585'], status=500)
+        await task
+
+        measurements = station.get_newest_measurements()
+        assert set(measurements) == set(('C6H6', 'PM10'))
+        assert measurements['C6H6'] == {'date': '2019-06-25 23:00:00', 'value': 0.5}
+        assert measurements['PM10'] == {'date': '2019-06-25 22:00:00', 'value': 21.3}
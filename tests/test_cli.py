@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `powietrze.cli` module."""
+
+import os
+
+import orjson
+import pytest
+from click.testing import CliRunner
+
+from powietrze import asynchronous, base, cli
+
+SAMPLE_STATIONS = [
+    {
+        'id': 117,
+        'stationName': 'Wrocław - Korzeniowskiego',
+        'gegrLat': '51.129378',
+        'gegrLon': '17.029250',
+        'city': {'id': 1064, 'name': 'Wrocław'},
+    },
+]
+
+SAMPLE_SENSORS = [
+    {'id': 3584, 'stationId': 117, 'param': {'paramCode': 'PM10'}},
+]
+
+SAMPLE_DATA = {
+    'key': 'PM10',
+    'values': [{'date': '2019-06-25 23:00:00', 'value': 21.3}],
+}
+
+
+@pytest.fixture
+def fake_api(monkeypatch, tmpdir):
+    requested = []
+
+    async def fetch_json_if_modified(self, url, timeout, etag=None):
+        requested.append(url)
+        if url.endswith('/findAll'):
+            return [dict(station) for station in SAMPLE_STATIONS], '"v1"'
+        if '/station/sensors/' in url:
+            return SAMPLE_SENSORS, None
+        return SAMPLE_DATA, None
+
+    monkeypatch.setattr(asynchronous.API, '_fetch_json_if_modified', fetch_json_if_modified)
+    monkeypatch.setattr(base, 'DEFAULT_CACHE_PATH',
+                        str(tmpdir.join('powietrze', 'stations.json')))
+    return requested
+
+
+def _stations_requests(requested):
+    return [url for url in requested if url.endswith('/findAll')]
+
+
+def test_default_cache_path():
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    assert base.DEFAULT_CACHE_PATH == os.path.join(cache_home, 'powietrze', 'stations.json')
+
+
+def test_cli_uses_stations_cache(fake_api):
+    runner = CliRunner()
+
+    result = runner.invoke(cli.cli, ['get-measurements-by-station-id', '117'])
+    assert result.exit_code == 0, result.output
+    assert 'Wrocław - Korzeniowskiego [117/Wrocław]:' in result.output
+    assert 'PM10    21.30 μg/m³ [2019-06-25 23:00:00]' in result.output
+    assert len(_stations_requests(fake_api)) == 1
+
+    with open(base.DEFAULT_CACHE_PATH, 'rb') as f:
+        assert orjson.loads(f.read())[0]['id'] == 117
+
+    # the second run reads the stations list from the cache
+    result = runner.invoke(cli.cli, ['get-measurements-by-station-id', '117'])
+    assert result.exit_code == 0, result.output
+    assert 'Wrocław - Korzeniowskiego [117/Wrocław]:' in result.output
+    assert len(_stations_requests(fake_api)) == 1
+
+
+def test_cli_no_cache(fake_api):
+    runner = CliRunner()
+
+    for x in range(2):
+        result = runner.invoke(cli.cli, ['--no-cache', 'get-measurements-by-station-id', '117'])
+        assert result.exit_code == 0, result.output
+        assert 'Wrocław - Korzeniowskiego [117/Wrocław]:' in result.output
+
+    assert len(_stations_requests(fake_api)) == 2
+    assert not os.path.exists(base.DEFAULT_CACHE_PATH)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `powietrze.synchronous` module."""
+
+import os
+import time
+
+import pytest
+
+from powietrze import synchronous
+
+SAMPLE_RESULT_FIND_ALL = b"""
+[
+    {
+        "id": 114,
+        "stationName": "Wroc\\u0142aw - Bartnicza",
+        "gegrLat": "51.115933",
+        "gegrLon": "17.141125",
+        "city": {"id": 1064, "name": "Wroc\\u0142aw"}
+    },
+    {
+        "id": 158,
+        "stationName": "Bydgoszcz Warszawska",
+        "gegrLat": "53.134083",
+        "gegrLon": "17.995708",
+        "city": {"id": 90, "name": "Bydgoszcz"}
+    }
+]"""
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+
+class FakeSession:
+    def __init__(self):
+        self.requests = []
+        self.responses = []
+
+    def get(self, url, timeout, headers):
+        self.requests.append((url, headers))
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(synchronous, '_SESSION', session)
+    return session
+
+
+def _make_stale(path):
+    stale = time.time() - 2 * synchronous.base.STATIONS_CACHE_TTL
+    os.utime(path, (stale, stale))
+    return stale
+
+
+def test_api_fetch_stations_data_cached(session, tmpdir):
+    cache_path = str(tmpdir.join('stations.json'))
+
+    session.responses.append(FakeResponse(200, SAMPLE_RESULT_FIND_ALL, {'ETag': '"v1"'}))
+    api = synchronous.API(cache_path=cache_path)
+    api.fetch_stations_data()
+    assert session.requests[-1][1] == {}
+    assert api.create_stations_by_ids([158])[0].name == 'Bydgoszcz Warszawska'
+    with open(cache_path + '.etag') as f:
+        assert f.read() == '"v1"'
+
+    # a fresh cache is used without asking the server
+    api = synchronous.API(cache_path=cache_path)
+    api.fetch_stations_data()
+    assert len(session.requests) == 1
+    assert len(api.create_stations_by_city_name('Wrocław')) == 1
+
+    # a stale cache is revalidated with its ETag
+    stale = _make_stale(cache_path)
+    session.responses.append(FakeResponse(304))
+    api = synchronous.API(cache_path=cache_path)
+    api.fetch_stations_data()
+    assert session.requests[-1][1] == {'If-None-Match': '"v1"'}
+    assert len(api.create_stations_by_city_name('Wrocław')) == 1
+    assert os.stat(cache_path).st_mtime > stale
+
+
+def test_api_fetch_stations_data_corrupt_cache(session, tmpdir):
+    cache_path = str(tmpdir.join('stations.json'))
+    with open(cache_path, 'wb') as f:
+        f.write(SAMPLE_RESULT_FIND_ALL[:40])
+    with open(cache_path + '.etag', 'w') as f:
+        f.write('"v1"')
+    _make_stale(cache_path)
+
+    # the corrupt body must not be revalidated, so a 304 is never offered
+    session.responses.append(FakeResponse(200, SAMPLE_RESULT_FIND_ALL, {'ETag': '"v2"'}))
+    api = synchronous.API(cache_path=cache_path)
+    api.fetch_stations_data()
+
+    assert session.requests[-1][1] == {}
+    assert len(api.create_stations_by_city_name('Wrocław')) == 1
+    with open(cache_path + '.etag') as f:
+        assert f.read() == '"v2"'
+
+    # the rewritten cache is valid again
+    _make_stale(cache_path)
+    session.responses.append(FakeResponse(304))
+    api = synchronous.API(cache_path=cache_path)
+    api.fetch_stations_data()
+    assert session.requests[-1][1] == {'If-None-Match': '"v2"'}
+    assert len(api.create_stations_by_city_name('Bydgoszcz')) == 1
+    assert sorted(os.listdir(str(tmpdir))) == ['stations.json', 'stations.json.etag']
+
+
+def test_api_fetch_stations_data_corrupt_cache_without_etag(session, tmpdir):
+    cache_path = str(tmpdir.join('stations.json'))
+    with open(cache_path, 'wb') as f:
+        f.write(b'not json')
+    with open(cache_path + '.etag', 'w') as f:
+        f.write('"v1"')
+
+    session.responses.append(FakeResponse(200, SAMPLE_RESULT_FIND_ALL))
+    api = synchronous.API(cache_path=cache_path)
+    api.fetch_stations_data()
+
+    assert session.requests[-1][1] == {}
+    assert not os.path.exists(cache_path + '.etag')
+    assert len(api.create_stations_by_city_name('Wrocław')) == 1
+
+
+def test_api_fetch_stations_data_corrupt_cache_unexpected_304(session, tmpdir):
+    cache_path = str(tmpdir.join('stations.json'))
+    with open(cache_path, 'wb') as f:
+        f.write(SAMPLE_RESULT_FIND_ALL[:40])
+    with open(cache_path + '.etag', 'w') as f:
+        f.write('"v1"')
+    _make_stale(cache_path)
+
+    session.responses.append(FakeResponse(304))
+    api = synchronous.API(cache_path=cache_path)
+    with pytest.raises(synchronous.APIError):
+        api.fetch_stations_data()
+
+    assert session.requests[-1][1] == {}
+    assert not os.path.exists(cache_path + '.etag')
+
+
+def test_api_fetch_stations_data_relative_cache_path(session, tmpdir, monkeypatch):
+    monkeypatch.chdir(str(tmpdir))
+
+    session.responses.append(FakeResponse(200, SAMPLE_RESULT_FIND_ALL, {'ETag': '"v1"'}))
+    api = synchronous.API(cache_path='stations.json')
+    api.fetch_stations_data()
+
+    assert tmpdir.join('stations.json').check(file=1)
+    assert tmpdir.join('stations.json.etag').read() == '"v1"'
+
+    api = synchronous.API(cache_path='stations.json')
+    api.fetch_stations_data()
+    assert len(session.requests) == 1
+    assert len(api.create_stations_by_city_name('Wrocław')) == 1
+
+
+@pytest.mark.parametrize('content', [b'{"a": 1}', b'"stations"', b'[1, 2]'])
+def test_api_fetch_stations_data_wrong_shape_cache(session, tmpdir, content):
+    cache_path = str(tmpdir.join('stations.json'))
+    with open(cache_path, 'wb') as f:
+        f.write(content)
+    with open(cache_path + '.etag', 'w') as f:
+        f.write('"v1"')
+
+    # a fresh but malformed cache is ignored like a missing one
+    session.responses.append(FakeResponse(200, SAMPLE_RESULT_FIND_ALL, {'ETag': '"v2"'}))
+    api = synchronous.API(cache_path=cache_path)
+    api.fetch_stations_data()
+
+    assert session.requests[-1][1] == {}
+    assert len(api.create_stations_by_city_name('Wrocław')) == 1
+    with open(cache_path + '.etag') as f:
+        assert f.read() == '"v2"'